@@ -1,62 +1,518 @@
 import hashlib
 import json
+import struct
 import time
-import random
-import string
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import padding, rsa
+import pickle
+import secrets
+from cryptography.exceptions import InvalidSignature, UnsupportedAlgorithm
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
 from cryptography.fernet import Fernet
-from dataclasses import dataclass, field
-from typing import List, Dict, Any, Optional
+from array import array
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, field, fields, replace
+from functools import lru_cache
+from itertools import compress
+from typing import List, Dict, Any, ClassVar, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 import argparse
 import json
 import os
 
+# Block hash preimage, field by field: struct codes for fixed-width fields, "utf8" for
+# strings and "hex" for hex digests. The nonce is packed last so mining can reuse a midstate;
+# the 80-byte prefix leaves room in its last 64-byte SHA-256 block for the nonce and padding,
+# so each attempt costs one compression
+_PREIMAGE_LAYOUT = (
+    ("index", "Q"),
+    ("timestamp", "d"),
+    ("previous_hash", "hex"),
+    ("tx_root", "hex"),
+)
+_NONCE = struct.Struct('<Q')
+
+# Length prefix of each record in the append-only chain and voter logs
+_RECORD_LENGTH = struct.Struct('<I')
+
+# Below this difficulty, starting worker processes costs more than the search itself
+PARALLEL_MIN_DIFFICULTY = 4
+
+# From this difficulty on, _mine uses the JIT scanner when available; compiling it takes
+# a couple of seconds, which only pays off over millions of attempts
+JIT_MIN_DIFFICULTY = 6
+_JIT_CHUNK = 1 << 20  # most nonces handed to one call of the JIT scanner
+
+# Nonces a mining worker claims from the shared counter at a time; large enough that
+# taking the counter's lock is negligible next to hashing the chunk
+NONCE_CHUNK = 10000
+
+
+@lru_cache(maxsize=None)
+def _load_jit_scanner():
+    """Build the JIT nonce scanner, or return None if numba, cffi or libcrypto is missing.
+    
+    Returns (midstate, scan): midstate(prefix) absorbs the prefix into an OpenSSL
+    SHA256_CTX, and scan(ctx, difficulty, start, count) tests `count` nonces
+    from that context in compiled code, returning the first match or -1.
+    """
+    try:
+        import ctypes.util
+        import numba
+        import numpy as np
+        from cffi import FFI
+    except ImportError:
+        return None
+    
+    libcrypto_path = ctypes.util.find_library("crypto")
+    if libcrypto_path is None:
+        return None
+    
+    ffi = FFI()
+    # SHA256_CTX is passed as an opaque byte buffer so numba can type the calls
+    ffi.cdef("""
+        int SHA256_Init(unsigned char *c);
+        int SHA256_Update(unsigned char *c, const unsigned char *data, size_t len);
+        int SHA256_Final(unsigned char *md, unsigned char *c);
+    """)
+    try:
+        libcrypto = ffi.dlopen(libcrypto_path)
+        sha256_update, sha256_final = libcrypto.SHA256_Update, libcrypto.SHA256_Final
+    except (AttributeError, OSError):
+        return None
+    ctx_size = 128  # sizeof(SHA256_CTX) is 112; leave headroom
+    
+    def midstate(prefix):
+        ctx = np.zeros(ctx_size, np.uint8)
+        libcrypto.SHA256_Init(ffi.from_buffer(ctx))
+        libcrypto.SHA256_Update(ffi.from_buffer(ctx), prefix, len(prefix))
+        return ctx
+    
+    @numba.njit
+    def scan(midstate_ctx, difficulty, start, count):
+        ctx = np.empty_like(midstate_ctx)
+        packed_nonce = np.empty(8, np.uint8)
+        digest = np.empty(32, np.uint8)
+        target_full_bytes = difficulty // 2
+        target_nibble = difficulty % 2
+        nonce = start
+        for _ in range(count):
+            ctx[:] = midstate_ctx
+            value = nonce
+            for i in range(8):  # little-endian, matching _NONCE
+                packed_nonce[i] = value & 0xFF
+                value >>= 8
+            sha256_update(ffi.from_buffer(ctx), ffi.from_buffer(packed_nonce), 8)
+            sha256_final(ffi.from_buffer(digest), ffi.from_buffer(ctx))
+            found = True
+            for i in range(target_full_bytes):
+                if digest[i] != 0:
+                    found = False
+                    break
+            if found and (target_nibble == 0 or digest[target_full_bytes] < 0x10):
+                return nonce
+            nonce += 1
+        return -1
+    
+    # Compile now rather than on the first scan, so processes forked after this inherit the
+    # compiled code instead of each compiling it again
+    scan(midstate(b""), 1, 0, 0)
+    return midstate, scan
+
+
+def _mine_jit(scanner, prefix, difficulty, start, count):
+    """_mine on the compiled scanner, in calls of at most _JIT_CHUNK nonces."""
+    midstate, scan = scanner
+    ctx = midstate(prefix)
+    nonce = start
+    end = None if count is None else start + count
+    while end is None or nonce < end:
+        batch = _JIT_CHUNK if end is None else min(_JIT_CHUNK, end - nonce)
+        found = scan(ctx, difficulty, nonce, batch)
+        if found >= 0:
+            return found, hashlib.sha256(prefix + _NONCE.pack(found)).digest()
+        nonce += batch
+    return None
+
+
+def _mine(prefix, difficulty, start=0, count=None):
+    """Search nonces until the hash of prefix + packed nonce has enough leading zeros.
+    
+    Tests start, start + 1, ... and gives up with None after `count` attempts.
+    """
+    if difficulty >= JIT_MIN_DIFFICULTY:
+        scanner = _load_jit_scanner()
+        if scanner is not None:
+            return _mine_jit(scanner, prefix, difficulty, start, count)
+    
+    # Compare raw digest bytes: each pair of hex zeros is one zero byte, an odd one is a high nibble
+    target_full_bytes = difficulty // 2
+    target_nibble = difficulty % 2
+    zero_bytes = b'\x00' * target_full_bytes
+    # Absorb the fixed prefix once; each attempt only clones the midstate and hashes the nonce
+    midstate = hashlib.sha256(prefix)
+    pack_nonce = _NONCE.pack
+    nonce = start
+    end = None if count is None else start + count
+    while nonce != end:
+        attempt = midstate.copy()
+        attempt.update(pack_nonce(nonce))
+        digest = attempt.digest()
+        if digest[:target_full_bytes] == zero_bytes and (
+                target_nibble == 0 or digest[target_full_bytes] < 0x10):
+            return nonce, digest
+        nonce += 1
+    return None
+
+
+_found = None
+_next_nonce = None
+
+
+def _init_miner(found, next_nonce):
+    global _found, _next_nonce
+    _found = found
+    _next_nonce = next_nonce
+
+
+def _mine_chunks(prefix, difficulty):
+    """Worker entry point: claim NONCE_CHUNK nonces at a time until any worker finds a match."""
+    while not _found.is_set():
+        with _next_nonce.get_lock():
+            start = _next_nonce.value
+            _next_nonce.value += NONCE_CHUNK
+        result = _mine(prefix, difficulty, start, NONCE_CHUNK)
+        if result is not None:
+            _found.set()
+            return result
+    return None
+
+
+@lru_cache(maxsize=None)
+def _workers_can_load_miner():
+    """Whether worker processes can find _mine_chunks, which they look up by module name.
+    
+    Fails when this file was loaded from its path (e.g. with importlib) rather than imported.
+    """
+    try:
+        pickle.dumps(_mine_chunks)
+    except (pickle.PicklingError, AttributeError):
+        return False
+    return True
+
+
+def _mine_parallel(prefix, difficulty, workers):
+    """Search the nonce space across processes; the first worker to find a match wins."""
+    # Workers are forked where possible so they inherit the JIT scanner compiled here, once,
+    # instead of every worker compiling it for every block
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    if difficulty >= JIT_MIN_DIFFICULTY:
+        _load_jit_scanner()
+    found = context.Event()
+    # Shared counter handing out nonce chunks, so a slow worker never leaves a gap to finish
+    next_nonce = context.Value('Q', 0)
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_miner, initargs=(found, next_nonce)) as pool:
+        futures = [pool.submit(_mine_chunks, prefix, difficulty) for _ in range(workers)]
+        for future in as_completed(futures):
+            result = future.result()
+            if result is not None:
+                found.set()
+                return result
+
+
+@lru_cache(maxsize=4096)
+def load_public_key(public_key_pem):
+    """Parse a PEM public key once and reuse the key object for every later verify.
+    
+    The cache is bounded, keeping the keys of recently active voters rather than every voter's.
+    """
+    return serialization.load_pem_public_key(public_key_pem.encode())
+
+
+@dataclass(slots=True)
+class RegistrationTx:
+    voter_id: str
+    district: str
+    public_key: str
+    timestamp: float
+    signature: Optional[str] = None
+    type: ClassVar[str] = "registration"
+
+
+@dataclass(slots=True)
+class VoteTx:
+    ballot_id: str
+    district: str
+    encrypted_vote: str
+    timestamp: float
+    type: ClassVar[str] = "vote"
+
+
+_TRANSACTION_TYPES = {tx_class.type: tx_class for tx_class in (RegistrationTx, VoteTx)}
+_FIELD_LENGTH = struct.Struct('<I')
+_FLOAT = struct.Struct('<d')
+
+
+def transaction_to_dict(transaction):
+    """JSON-ready form of a transaction, tagged with its type."""
+    record = {"type": transaction.type, **asdict(transaction)}
+    if record.get("signature") is None:
+        record.pop("signature", None)
+    return record
+
+
+def transaction_from_dict(record):
+    values = dict(record)
+    return _TRANSACTION_TYPES[values.pop("type")](**values)
+
+
+def _transaction_bytes(transaction, include_signature=True):
+    """Type tag and field values, each length-prefixed; floats packed as 8-byte doubles."""
+    parts = [transaction.type.encode()]
+    for tx_field in fields(transaction):
+        value = getattr(transaction, tx_field.name)
+        if tx_field.name == "signature" and not include_signature:
+            continue
+        if value is None:
+            parts.append(b"")
+        elif isinstance(value, float):
+            parts.append(_FLOAT.pack(value))
+        else:
+            parts.append(str(value).encode())
+    return b"".join(_FIELD_LENGTH.pack(len(part)) + part for part in parts)
+
+
+def _signing_payload(transaction):
+    """Canonical bytes covered by a transaction's signature: every field but the signature."""
+    return _transaction_bytes(transaction, include_signature=False)
+
+
+def sign_transaction(private_key, transaction):
+    """Return a copy of the transaction carrying a hex signature over its payload."""
+    signature = private_key.sign(_signing_payload(transaction), ec.ECDSA(hashes.SHA256()))
+    return replace(transaction, signature=signature.hex())
+
+
+def tx_digest(transaction):
+    """SHA-256 of a transaction's packed fields; the leaf hash in a block's Merkle tree."""
+    return hashlib.sha256(_transaction_bytes(transaction)).digest()
+
+
+def _merkle_parent_level(level):
+    # An unpaired last node is carried up unchanged; pairing it with a copy of itself would
+    # give [A, B, C] and [A, B, C, C] the same root
+    parents = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        parents.append(level[-1])
+    return parents
+
+
+def merkle_root(leaves):
+    """Hash leaf hashes pairwise up to a single 32-byte root."""
+    if not leaves:
+        return hashlib.sha256(b"").digest()
+    level = list(leaves)
+    while len(level) > 1:
+        level = _merkle_parent_level(level)
+    return level[0]
+
+
+def _log_paths(filename):
+    """Chain and voter log paths that accompany a state snapshot file."""
+    base = os.path.splitext(filename)[0]
+    return f"{base}.chain.bin", f"{base}.voters.bin"
+
+
+def _authority_key_path(filename):
+    """Path of the election authority's private key for a state snapshot file."""
+    return f"{os.path.splitext(filename)[0]}.authority.pem"
+
+
+def _append_records(path, records, mode="ab"):
+    """Append each record as a length-prefixed JSON blob."""
+    blobs = [json.dumps(record).encode() for record in records]
+    if not blobs and mode == "ab":
+        return  # leave the log untouched (it may be read-only) when there is nothing to add
+    with open(path, mode) as f:
+        for blob in blobs:
+            f.write(_RECORD_LENGTH.pack(len(blob)) + blob)
+
+
+def _read_records(path):
+    """Yield the records of a log written by _append_records.
+    
+    Reading stops at a torn record left by an interrupted append; the file is left as it
+    is, and _cut_torn_tail removes the torn bytes before the next append.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_RECORD_LENGTH.size)
+            if not header:
+                return
+            if len(header) < _RECORD_LENGTH.size:
+                break
+            (length,) = _RECORD_LENGTH.unpack(header)
+            blob = f.read(length)
+            if len(blob) < length:
+                break
+            yield json.loads(blob)
+        print(f"Warning: ignoring an incomplete record at the end of {path} left by an interrupted save")
+
+
+def _cut_torn_tail(path):
+    """Truncate a torn record off the end of a log, so appends start on a record boundary.
+    
+    Returns the number of bytes cut.
+    """
+    if not os.path.exists(path):
+        return 0
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        good_end = 0
+        while good_end < size:
+            header = f.read(_RECORD_LENGTH.size)
+            if len(header) < _RECORD_LENGTH.size:
+                break
+            (length,) = _RECORD_LENGTH.unpack(header)
+            if good_end + _RECORD_LENGTH.size + length > size:
+                break
+            good_end = f.seek(length, os.SEEK_CUR)
+    if good_end < size:
+        with open(path, "r+b") as f:
+            f.truncate(good_end)
+    return size - good_end
+
+
+def _compile_preimage_builder(layout):
+    """Generate a packer specialised to `layout` as a single return expression.
+    
+    Runs of fixed-width fields share one precompiled struct, and every helper is bound
+    in the function's globals, so a call does no per-field dispatch or attribute lookups.
+    """
+    namespace = {"_fromhex": bytes.fromhex}
+    terms = []
+    run = []
+    
+    def close_run():
+        if run:
+            pack_name = f"_pack{len(terms)}"
+            namespace[pack_name] = struct.Struct("<" + "".join(code for _, code in run)).pack
+            terms.append(f"{pack_name}({', '.join(name for name, _ in run)})")
+            run.clear()
+    
+    for name, code in layout:
+        if code == "utf8":
+            close_run()
+            terms.append(f"{name}.encode()")
+        elif code == "hex":
+            close_run()
+            terms.append(f"_fromhex({name})")
+        else:
+            run.append((name, code))
+    close_run()
+    
+    params = ", ".join(name for name, _ in layout)
+    exec(f"def _make_preimage({params}):\n    return {' + '.join(terms)}\n", namespace)
+    return namespace["_make_preimage"]
+
+
+# e.g. _pack0(index, timestamp) + _fromhex(previous_hash) + _fromhex(tx_root)
+_make_preimage = _compile_preimage_builder(_PREIMAGE_LAYOUT)
+
+
 class Block:
-    def __init__(self, index, transactions, timestamp, previous_hash, nonce=0):
+    def __init__(self, index, transactions, timestamp, previous_hash, nonce=0, tx_root=None, _skip_hash=False):
         self.index = index
         self.transactions = transactions
         self.timestamp = timestamp
         self.previous_hash = previous_hash
         self.nonce = nonce
+        self.signature = None  # authority signature over the hash, hex-encoded
+        if _skip_hash:
+            # Restored from storage: keep the stored tx_root, and the caller assigns the stored
+            # hash; is_valid() rechecks both, so loading itself hashes nothing
+            self.tx_root = tx_root
+            self._preimage = None
+            self.hash = None
+            return
+        self.tx_root = self.compute_tx_root()
+        # Pack every field except the nonce once; hashing then only appends the 8-byte nonce
+        self._preimage = self._hash_prefix()
         self.hash = self.compute_hash()
     
+    def _hash_prefix(self):
+        """Pack every field except the nonce, which is appended last when hashing.
+        
+        Transactions enter only through their Merkle root, so the preimage size
+        does not grow with the number of transactions.
+        """
+        return _make_preimage(self.index, self.timestamp, self.previous_hash, self.tx_root)
+    
+    def compute_tx_root(self):
+        return merkle_root([tx_digest(transaction) for transaction in self.transactions]).hex()
+    
+    def compute_hash_digest(self):
+        return hashlib.sha256((self._preimage or self._hash_prefix()) + _NONCE.pack(self.nonce)).digest()
+    
     def compute_hash(self):
-        block_string = json.dumps({
-            "index": self.index,
-            "transactions": self.transactions,
-            "timestamp": self.timestamp,
-            "previous_hash": self.previous_hash,
-            "nonce": self.nonce
-        }, sort_keys=True).encode()
+        return self.compute_hash_digest().hex()
+    
+    def is_valid(self):
+        """Recheck tx_root against the transactions, then the hash against freshly packed fields."""
+        digests = [tx_digest(transaction) for transaction in self.transactions]
+        # Each transaction, and each ballot, may appear only once in a block
+        if len(set(digests)) != len(digests):
+            return False
+        ballot_ids = [transaction.ballot_id for transaction in self.transactions if isinstance(transaction, VoteTx)]
+        if len(set(ballot_ids)) != len(ballot_ids):
+            return False
         
-        return hashlib.sha256(block_string).hexdigest()
+        if self.tx_root != merkle_root(digests).hex():
+            return False
+        # Repack rather than trust _preimage, which was built when the block was created
+        try:
+            prefix = self._hash_prefix()
+        except ValueError:  # previous_hash or tx_root is not a hex digest
+            return False
+        digest = hashlib.sha256(prefix + _NONCE.pack(self.nonce)).digest()
+        return self.hash == digest.hex()
     
-    def proof_of_work(self, difficulty):
+    def proof_of_work(self, difficulty, workers=None):
         """Mine the block by finding a hash with specified leading zeros."""
-        self.nonce = 0
-        computed_hash = self.compute_hash()
-        
-        while not computed_hash.startswith('0' * difficulty):
-            self.nonce += 1
-            computed_hash = self.compute_hash()
+        workers = workers or os.cpu_count() or 1
+        # _mine iterates nonces over the preimage packed in __init__ (restored blocks pack it here)
+        preimage = self._preimage or self._hash_prefix()
+        if workers > 1 and difficulty >= PARALLEL_MIN_DIFFICULTY and _workers_can_load_miner():
+            self.nonce, digest = _mine_parallel(preimage, difficulty, workers)
+        else:
+            self.nonce, digest = _mine(preimage, difficulty)
+        computed_hash = digest.hex()
         
         self.hash = computed_hash
         return computed_hash
 
 
 class Blockchain:
-    def __init__(self, difficulty=2):
+    batch_size = 64  # pending transactions that trigger a new block without an explicit flush
+    
+    def __init__(self, difficulty=2, authority_key=None, authority_public_key=None):
         self.chain = []
         self.difficulty = difficulty
+        self.authority_key = authority_key  # Ed25519 key that signs every block, if any
+        # Verifies the seals; without the private key the chain can be checked but not extended
+        self.authority_public_key = authority_public_key or (authority_key and authority_key.public_key())
         self.pending_transactions = []
         self.genesis_created = False
+        self._verified_sig_cache = set()  # digests of (payload, signature) pairs already checked
     
     def create_genesis_block(self):
         """Create the first block in the chain with arbitrary previous hash."""
         if not self.genesis_created:
-            genesis_block = Block(0, [], time.time(), "0")
+            genesis_block = Block(0, [], time.time(), "0" * 64)
             genesis_block.hash = genesis_block.compute_hash()
+            self._seal(genesis_block)
             self.chain.append(genesis_block)
             self.genesis_created = True
     
@@ -64,51 +520,136 @@ class Blockchain:
     def last_block(self):
         return self.chain[-1]
     
+    def _seal(self, block):
+        """Sign the block hash with the authority key."""
+        if self.authority_key is not None:
+            block.signature = self.authority_key.sign(bytes.fromhex(block.hash)).hex()
+    
+    def _is_sealed(self, block):
+        """Check the authority's signature over the block hash."""
+        if self.authority_public_key is None:
+            return True
+        try:
+            self.authority_public_key.verify(bytes.fromhex(block.signature), bytes.fromhex(block.hash))
+        except (InvalidSignature, TypeError, ValueError):
+            return False
+        return True
+    
     def add_transaction(self, transaction):
-        """Add a transaction to the pending transactions list."""
+        """Add a transaction to the pending transactions list, mining once a full batch is queued."""
         if self.verify_transaction(transaction):
             self.pending_transactions.append(transaction)
+            if len(self.pending_transactions) >= self.batch_size:
+                self.sign_pending_transactions()
             return True
         return False
     
     def verify_transaction(self, transaction):
         """Verify digital signature and transaction validity."""
-        # Implementation depends on transaction type
-        # For vote transactions, verify voter hasn't voted before
-        # For registration transactions, verify identity
-        return True  # Simplified for this example
-    
-    def mine_pending_transactions(self):
-        """Create a new block with all pending transactions and add it to the chain."""
-        if not self.pending_transactions:
+        # Unsigned transactions are accepted as before; signed ones must verify
+        if getattr(transaction, "signature", None) is None:
+            return True
+        try:
+            public_key = load_public_key(transaction.public_key)
+        except (AttributeError, UnsupportedAlgorithm, ValueError):
+            return False
+        return self._verify_signature(transaction, public_key)
+    
+    def _signature_cache_key(self, transaction):
+        # Key on payload + signature, not the signature alone, so a valid signature can't be replayed
+        return hashlib.sha256(_signing_payload(transaction) + transaction.signature.encode()).digest()
+    
+    def _verify_signature(self, transaction, public_key):
+        cache_key = self._signature_cache_key(transaction)
+        if cache_key in self._verified_sig_cache:
+            return True
+        
+        try:
+            public_key.verify(
+                bytes.fromhex(transaction.signature),
+                _signing_payload(transaction),
+                ec.ECDSA(hashes.SHA256())
+            )
+        except (InvalidSignature, TypeError, ValueError):
+            return False
+        
+        self._verified_sig_cache.add(cache_key)
+        return True
+    
+    def _batch_verify(self, transactions):
+        """Return the transactions whose signatures verify, checking each signer's key in one pass."""
+        by_key = defaultdict(list)
+        for transaction in transactions:
+            if getattr(transaction, "signature", None) is not None:
+                by_key[transaction.public_key].append(transaction)
+        
+        rejected = set()
+        for public_key_pem, group in by_key.items():
+            try:
+                public_key = load_public_key(public_key_pem)
+            except (AttributeError, UnsupportedAlgorithm, ValueError):
+                rejected.update(id(transaction) for transaction in group)
+                continue
+            for transaction in group:
+                if not self._verify_signature(transaction, public_key):
+                    rejected.add(id(transaction))
+        
+        return [transaction for transaction in transactions if id(transaction) not in rejected]
+    
+    def sign_pending_transactions(self):
+        """Create a new block with all pending transactions and add it to the chain.
+        
+        The whole batch is committed to by the block's Merkle root (tx_root), so one
+        authority signature (and proof-of-work, if difficulty > 0) covers every
+        transaction queued since the last block.
+        """
+        if self.authority_key is None and self.authority_public_key is not None:
+            raise ValueError("The election authority's private key is not loaded, so no block can be sealed")
+        
+        # Signatures already checked by add_transaction are skipped via the verified-signature cache
+        transactions = self._batch_verify(self.pending_transactions)
+        self.pending_transactions = []
+        if not transactions:
             return False
             
         block = Block(
             index=len(self.chain),
-            transactions=self.pending_transactions,
+            transactions=transactions,
             timestamp=time.time(),
             previous_hash=self.last_block.hash
         )
         
-        print("Mining block... This may take a moment.")
-        block.proof_of_work(self.difficulty)
+        if self.difficulty > 0:
+            print("Mining block... This may take a moment.")
+            block.proof_of_work(self.difficulty)
+        self._seal(block)
         self.chain.append(block)
-        self.pending_transactions = []
-        print(f"Block mined with hash: {block.hash[:10]}...")
+        print(f"Block added with hash: {block.hash[:10]}...")
         return True
     
     def is_chain_valid(self):
         """Verify the integrity of the blockchain."""
-        for i in range(1, len(self.chain)):
+        seen_ballot_ids = set()
+        for i in range(len(self.chain)):
             current = self.chain[i]
-            previous = self.chain[i-1]
             
-            # Verify current block's hash
-            if current.hash != current.compute_hash():
+            # Verify current block's transaction root and hash, the genesis block's included
+            if not current.is_valid():
                 return False
             
-            # Verify current block's reference to previous block's hash
-            if current.previous_hash != previous.hash:
+            # is_valid rejects a ballot repeated within the block; also reject one from an earlier block
+            for transaction in current.transactions:
+                if isinstance(transaction, VoteTx):
+                    if transaction.ballot_id in seen_ballot_ids:
+                        return False
+                    seen_ballot_ids.add(transaction.ballot_id)
+            
+            # Verify current block's reference to previous block's hash; the genesis block has none
+            if i > 0 and current.previous_hash != self.chain[i-1].hash:
+                return False
+            
+            # Verify the election authority signed this block
+            if not self._is_sealed(current):
                 return False
         
         return True
@@ -124,10 +665,8 @@ class Voter:
     
     def generate_keys():
         """Generate a keypair for a voter."""
-        private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=2048
-        )
+        # ECDSA P-256 verifies faster than RSA-2048 and keeps signatures small in the chain
+        private_key = ec.generate_private_key(ec.SECP256R1())
         public_key = private_key.public_key()
         return private_key, public_key
 
@@ -139,8 +678,20 @@ class Election:
         self.districts = districts    # List of valid districts
         self.voter_registry = {}      # voter_id -> Voter
         self.ballot_registry = {}     # district -> list of candidates
-        self.blockchain = Blockchain(2)  # Lower difficulty for demo purposes
+        # Blocks are signed by the election authority; proof-of-work adds no security to a
+        # permissioned chain, so it is disabled
+        self.authority_key = ed25519.Ed25519PrivateKey.generate()
+        self.blockchain = Blockchain(0, self.authority_key)
         self.election_key = self.generate_election_key()
+        self._fernet = Fernet(self.election_key)  # parsed once, reused for every vote
+        self._saved_blocks = 0        # blocks already written to the chain log
+        self._new_logs = not loading  # the first save replaces any stale logs instead of appending
+        self._dirty_voters = set()    # voter_ids changed since the last save
+        # Participation columns, one row per registered voter, kept in step with voter_registry
+        self._district_index = {district: i for i, district in enumerate(districts)}
+        self._voter_rows = {}                 # voter_id -> row
+        self._voter_districts = array('H')    # row -> district index
+        self._voter_voted = bytearray()       # row -> 1 once the voter has voted
 
         if not loading:
             self.blockchain.create_genesis_block()
@@ -149,6 +700,11 @@ class Election:
         """Generate a symmetric key for tallying votes."""
         return Fernet.generate_key()
     
+    def _add_voter_row(self, voter):
+        self._voter_rows[voter.voter_id] = len(self._voter_voted)
+        self._voter_districts.append(self._district_index[voter.district])
+        self._voter_voted.append(voter.has_voted)
+    
     def register_voter(self, voter_id, district, public_key):
         """Register a new voter."""
         if voter_id in self.voter_registry:
@@ -161,23 +717,27 @@ class Election:
         
         voter = Voter(voter_id=voter_id, public_key=public_key, district=district)
         self.voter_registry[voter_id] = voter
+        self._dirty_voters.add(voter_id)
         
         # Create a registration transaction
-        transaction = {
-            "type": "registration",
-            "voter_id": voter_id,
-            "district": district,
-            "public_key": public_key,
-            "timestamp": time.time()
-        }
+        transaction = RegistrationTx(
+            voter_id=voter_id,
+            district=district,
+            public_key=public_key,
+            timestamp=time.time()
+        )
         
+        # The transaction is added to the chain with the next batch (see flush)
         success = self.blockchain.add_transaction(transaction)
-        if success:
-            self.blockchain.mine_pending_transactions()
+        if not success:
+            del self.voter_registry[voter_id]
+            self._dirty_voters.discard(voter_id)
+            return False, "Failed to register voter"
         
         # Mark voter as registered
-            voter.registered = True
-            return True, "Voter registered successfully"
+        voter.registered = True
+        self._add_voter_row(voter)
+        return True, "Voter registered successfully"
     
     def prepare_ballot(self, voter_id):
         """Prepare an encrypted ballot for the voter."""
@@ -197,8 +757,8 @@ class Election:
             self.candidates  # Default to all candidates if no district-specific ballot
         )
         
-        # Create ballot with a unique identifier
-        ballot_id = ''.join(random.choices(string.ascii_uppercase + string.digits, k=16))
+        # Create ballot with an unpredictable unique identifier (16 hex chars, 64 bits)
+        ballot_id = secrets.token_hex(8)
         
         ballot = {
             "ballot_id": ballot_id,
@@ -221,66 +781,78 @@ class Election:
         # In a real system, verify the signature here
         
         # Encrypt the vote with the election key
-        f = Fernet(self.election_key)
-        encrypted_vote = f.encrypt(selected_candidate.encode()).decode()
+        encrypted_vote = self._fernet.encrypt(selected_candidate.encode()).decode()
         
         # Create a vote transaction
-        vote_transaction = {
-            "type": "vote",
-            "ballot_id": ballot_id,
-            "district": voter.district,
-            "encrypted_vote": encrypted_vote,
-            "timestamp": time.time()
-        }
+        vote_transaction = VoteTx(
+            ballot_id=ballot_id,
+            district=voter.district,
+            encrypted_vote=encrypted_vote,
+            timestamp=time.time()
+        )
         
         success = self.blockchain.add_transaction(vote_transaction)
         if success:
             voter.has_voted = True
-            self.blockchain.mine_pending_transactions()
+            self._voter_voted[self._voter_rows[voter_id]] = 1
+            self._dirty_voters.add(voter_id)
             return True, "Vote cast successfully"
         
         return False, "Failed to cast vote"
     
+    def flush(self):
+        """Add every queued registration and vote to the chain as a single block."""
+        return self.blockchain.sign_pending_transactions()
+    
     def tally_votes(self):
         """Count all votes and return the results."""
-        vote_count = {candidate: 0 for candidate in self.candidates}
-        district_results = {district: {candidate: 0 for candidate in self.candidates} 
-                           for district in self.districts}
-        
-        f = Fernet(self.election_key)
-        
-        # Iterate through all blocks and count votes
-        for block in self.blockchain.chain:
-            for transaction in block.transactions:
-                if transaction.get("type") == "vote":
-                    try:
-                        # Decrypt the vote
-                        encrypted_vote = transaction["encrypted_vote"]
-                        candidate = f.decrypt(encrypted_vote.encode()).decode()
-                        district = transaction["district"]
-                        
-                        # Count the vote
-                        if candidate in vote_count:
-                            vote_count[candidate] += 1
-                            district_results[district][candidate] += 1
-                    except Exception as e:
-                        print(f"Error counting vote: {e}")
+        # Collect every vote in one pass over the chain, then decrypt and count in bulk
+        vote_tuples = [(transaction.district, transaction.encrypted_vote)
+                       for block in self.blockchain.chain
+                       for transaction in block.transactions
+                       if isinstance(transaction, VoteTx)]
+        pair_counts = Counter((district, self._decrypt_vote(encrypted_vote))
+                              for district, encrypted_vote in vote_tuples)
+        
+        vote_count = dict.fromkeys(self.candidates, 0)
+        district_results = {district: dict.fromkeys(self.candidates, 0) for district in self.districts}
+        
+        # One update per distinct (district, candidate) pair rather than per vote
+        for (district, candidate), votes in pair_counts.items():
+            if district not in district_results:
+                print(f"Error counting vote: unknown district {district!r}")
+                continue
+            if candidate in vote_count:
+                vote_count[candidate] += votes
+                district_results[district][candidate] += votes
         
         return vote_count, district_results
     
+    def _decrypt_vote(self, encrypted_vote):
+        try:
+            return self._fernet.decrypt(encrypted_vote.encode()).decode()
+        except Exception as e:
+            print(f"Error counting vote: {e}")
+            return None
+    
     def get_voter_participation(self):
         """Calculate voter participation statistics."""
-        total_voters = len(self.voter_registry)
-        voted_voters = sum(1 for voter in self.voter_registry.values() if voter.has_voted)
+        # Count over the participation columns in C instead of touching every Voter object
+        total_voters = len(self._voter_voted)
+        voted_voters = self._voter_voted.count(1)
         
         participation_rate = (voted_voters / total_voters) * 100 if total_voters > 0 else 0
         
-        district_stats = {district: {"registered": 0, "voted": 0} for district in self.districts}
-        
-        for voter in self.voter_registry.values():
-            district_stats[voter.district]["registered"] += 1
-            if voter.has_voted:
-                district_stats[voter.district]["voted"] += 1
+        # One pass per column for all districts, rather than one count() per district
+        registered_by_district = Counter(self._voter_districts)
+        voted_by_district = Counter(compress(self._voter_districts, self._voter_voted))
+        district_stats = {
+            district: {
+                "registered": registered_by_district[i],
+                "voted": voted_by_district[i]
+            }
+            for district, i in self._district_index.items()
+        }
         
         return {
             "total_voters": total_voters,
@@ -289,52 +861,163 @@ class Election:
             "district_stats": district_stats
         }
     def save_state(self, filename="election_state.json"):
-        """Save the current state of the election to a file."""
+        """Save the current state of the election to a file.
+        
+        Blocks and voter records are appended to logs next to the snapshot, so a save
+        only writes what changed since the last one; the snapshot itself holds the
+        small, bounded parts of the state. The authority's private key is written once,
+        to its own file, so it can be kept away from the logs its seals protect; the
+        snapshot holds only the public key.
+        """
+        chain_path, voters_path = _log_paths(filename)
+        # A new election starts fresh logs rather than appending to a stale pair
+        mode = "wb" if self._new_logs else "ab"
+        if mode == "ab":
+            for path in (chain_path, voters_path):
+                cut = _cut_torn_tail(path)
+                if cut:
+                    print(f"Cut {cut} bytes of an incomplete record from the end of {path}")
+        
+        if self._new_logs and self.authority_key is not None:
+            self.save_authority_key(_authority_key_path(filename))
+        
+        self.append_blocks(chain_path, self.blockchain.chain[self._saved_blocks:], mode)
+        _append_records(voters_path, (vars(self.voter_registry[vid]) for vid in sorted(self._dirty_voters)), mode)
+        self._dirty_voters.clear()
+        self._new_logs = False
+        
         state = {
             "name": self.name,
             "candidates": self.candidates,
             "districts": self.districts,
-            "voter_registry": {vid: vars(voter) for vid, voter in self.voter_registry.items()},
             "ballot_registry": self.ballot_registry,
-            "blockchain": [vars(block) for block in self.blockchain.chain],
+            "pending_transactions": [
+                transaction_to_dict(transaction) for transaction in self.blockchain.pending_transactions
+            ],
             "election_key": self.election_key.decode(),  # Convert bytes to string for JSON
+            "authority_public_key": self.blockchain.authority_public_key.public_bytes(
+                serialization.Encoding.Raw,
+                serialization.PublicFormat.Raw
+            ).hex(),
             "difficulty": self.blockchain.difficulty,
-            "genesis_created": self.blockchain.genesis_created
+            "genesis_created": self.blockchain.genesis_created,
+            "saved_blocks": self._saved_blocks  # chain length pending_transactions was taken at
         }
-        with open(filename, "w") as f:
+        # Write a temporary file and swap it in, so an interrupted save leaves the old snapshot whole
+        temp_filename = f"{filename}.tmp"
+        with open(temp_filename, "w") as f:
             json.dump(state, f, indent=4)
+        os.replace(temp_filename, filename)
+    
+    def save_authority_key(self, path):
+        """Write the authority's private key as PEM, readable by the owner only."""
+        pem = self.authority_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption()
+        )
+        with open(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as f:
+            f.write(pem)
+    
+    def append_blocks(self, chain_path, blocks, mode="ab"):
+        """Append blocks to the chain log and remember how many have been persisted."""
+        _append_records(chain_path, (
+            {
+                **{key: value for key, value in vars(block).items() if not key.startswith("_")},
+                "transactions": [transaction_to_dict(transaction) for transaction in block.transactions]
+            }
+            for block in blocks
+        ), mode)
+        self._saved_blocks = len(self.blockchain.chain)
 
     @staticmethod
     def load_state(filename="election_state.json"):
-        """Load the election state from a file."""
+        """Load the election state from a file.
+        
+        Raises ValueError for snapshots from earlier versions: ones that kept the chain and
+        voter registry inline (saving over them would discard both) or that lack the
+        authority public key; for an authority key file that does not match; and for a
+        chain log missing blocks the snapshot was saved with.
+        """
         if not os.path.exists(filename):
             return None
 
         with open(filename, "r") as f:
             state = json.load(f)
 
+        if "blockchain" in state or "voter_registry" in state:
+            raise ValueError(
+                f"{filename} was written by an earlier version that stored the blockchain "
+                "inside the snapshot, in a hash format this version cannot verify. "
+                "Move it aside to start a new election."
+            )
+
         # Reconstruct the Election object
         election = Election(state["name"], state["candidates"], state["districts"], loading = True)
         election.ballot_registry = state["ballot_registry"]
         election.election_key = state["election_key"].encode()  # Convert string back to bytes
+        election._fernet = Fernet(election.election_key)
         election.blockchain.difficulty = state["difficulty"]
+        if "authority_public_key" not in state:
+            raise ValueError(
+                f"{filename} has no election authority public key; it was saved by an earlier "
+                "version, so its blocks cannot be verified. Move it aside to start a new election."
+            )
+        election.blockchain.authority_public_key = ed25519.Ed25519PublicKey.from_public_bytes(
+            bytes.fromhex(state["authority_public_key"])
+        )
+        # Without the private key the election can still be verified and tallied, but not extended
+        election.authority_key = None
+        key_path = _authority_key_path(filename)
+        if os.path.exists(key_path):
+            with open(key_path, "rb") as f:
+                election.authority_key = serialization.load_pem_private_key(f.read(), password=None)
+            if election.authority_key.public_key() != election.blockchain.authority_public_key:
+                raise ValueError(f"{key_path} is not the authority key {filename} was saved with.")
+        election.blockchain.authority_key = election.authority_key
+        chain_path, voters_path = _log_paths(filename)
 
-        # Reconstruct the blockchain
-        for block_data in state["blockchain"]:
+        # Replay the chain log one record at a time; hashes are checked by is_chain_valid, not here
+        for block_data in _read_records(chain_path):
             block = Block(
                 index=block_data["index"],
-                transactions=block_data["transactions"],
+                transactions=[transaction_from_dict(record) for record in block_data["transactions"]],
                 timestamp=block_data["timestamp"],
                 previous_hash=block_data["previous_hash"],
-                nonce=block_data["nonce"]
+                nonce=block_data["nonce"],
+                tx_root=block_data["tx_root"],
+                _skip_hash=True
             )
             block.hash = block_data["hash"]  # Restore the computed hash
+            block.signature = block_data.get("signature")
             election.blockchain.chain.append(block)
+        election._saved_blocks = len(election.blockchain.chain)
+        # A torn last block is one whose save never finished; a log shorter than the snapshot
+        # has lost blocks that were saved, and appending to it would hide the loss
+        if election._saved_blocks < state.get("saved_blocks", 0):
+            raise ValueError(
+                f"{chain_path} holds {election._saved_blocks} blocks, but {filename} was saved "
+                f"with {state['saved_blocks']}; saved blocks are missing from the chain log."
+            )
 
         election.blockchain.genesis_created = state.get("genesis_created", False)
+        pending_transactions = [transaction_from_dict(record) for record in state.get("pending_transactions", [])]
+        # The chain log is written before the snapshot, so a save interrupted in between leaves
+        # transactions listed as pending that are already in a block; drop them rather than add
+        # them to the chain a second time
+        mined = {
+            tx_digest(transaction)
+            for block in election.blockchain.chain[state.get("saved_blocks", len(election.blockchain.chain)):]
+            for transaction in block.transactions
+        }
+        if mined:
+            pending_transactions = [
+                transaction for transaction in pending_transactions if tx_digest(transaction) not in mined
+            ]
+        election.blockchain.pending_transactions = pending_transactions
 
-        # Reconstruct the voter registry
-        for vid, voter_data in state["voter_registry"].items():
+        # Replay the voter log; later records for a voter supersede earlier ones
+        for voter_data in _read_records(voters_path):
             voter = Voter(
                 voter_id=voter_data["voter_id"],
                 public_key=voter_data["public_key"],
@@ -342,7 +1025,10 @@ class Election:
                 registered=voter_data["registered"],
                 has_voted=voter_data["has_voted"]
             )
-            election.voter_registry[vid] = voter
+            election.voter_registry[voter.voter_id] = voter
+
+        for voter in election.voter_registry.values():
+            election._add_voter_row(voter)
 
         return election
     
@@ -389,6 +1075,16 @@ def cast_vote_interactive(election, voter_id, selected_candidate):
     print(message)
 
 
+def flush_interactive(election):
+    print("\nAdding pending transactions to the blockchain...")
+    if election.flush():
+        # Report the new block, not the queue: transactions failing signature checks are dropped
+        transaction_count = len(election.blockchain.last_block.transactions)
+        print(f"{transaction_count} pending transactions added to the blockchain")
+    else:
+        print("No pending transactions to add")
+
+
 def display_results(election):
     """Display the election results."""
     print("\n--- ELECTION RESULTS ---")
@@ -446,15 +1142,20 @@ def verify_blockchain(election):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Blockchain Voting System CLI")
-    parser.add_argument('--action', required=True, choices=['register', 'vote', 'results', 'participation', 'verify'])
+    parser.add_argument('--action', required=True, choices=['register', 'vote', 'flush', 'results', 'participation', 'verify'])
     parser.add_argument('--voter_id', required=False)
     parser.add_argument('--district', required=False)
     parser.add_argument('--candidate', required=False)
     
     args = parser.parse_args()
 
-    # Load or initialize the election state
-    election = Election.load_state("election_state.json")
+    # Load or initialize the election state; refuse to continue (and so to overwrite) unreadable state
+    try:
+        election = Election.load_state("election_state.json")
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
+    # Only these actions change an existing election, so the others also work on read-only state files
+    needs_save = election is None or args.action in ('register', 'vote', 'flush')
     if not election:
         # Initialize a new election if no state exists
         candidates = ["Candidate A", "Candidate B", "Candidate C"]
@@ -466,12 +1167,17 @@ if __name__ == "__main__":
             register_voter_interactive(election, args.voter_id, args.district)
         elif args.action == 'vote':            
             cast_vote_interactive(election, args.voter_id, args.candidate)
+        elif args.action == 'flush':
+            flush_interactive(election)
         elif args.action == 'results':
             display_results(election)
         elif args.action == 'participation':
             display_participation(election)
         elif args.action == 'verify':
             verify_blockchain(election)
+    except ValueError as e:
+        parser.exit(1, f"{e}\n")
     finally:
         # Save the election state before exiting
-        election.save_state("election_state.json")
\ No newline at end of file
+        if needs_save:
+            election.save_state("election_state.json")
\ No newline at end of file
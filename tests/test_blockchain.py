@@ -0,0 +1,327 @@
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from cryptography.hazmat.primitives import serialization
+
+_MODULE_PATH = os.path.join(os.path.dirname(__file__), "..", "Blockchain Based voting system.py")
+_spec = importlib.util.spec_from_file_location("voting_system", _MODULE_PATH)
+voting = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(voting)
+
+
+def _vote(ballot_id, encrypted_vote="encrypted"):
+    return voting.VoteTx(ballot_id=ballot_id, district="District 1", encrypted_vote=encrypted_vote, timestamp=1.0)
+
+
+def _chain_with_block(transactions):
+    blockchain = voting.Blockchain(0)
+    blockchain.create_genesis_block()
+    for transaction in transactions:
+        blockchain.add_transaction(transaction)
+    blockchain.sign_pending_transactions()
+    return blockchain
+
+
+class MerkleRootTest(unittest.TestCase):
+    def test_duplicated_last_leaf_changes_root(self):
+        leaves = [voting.tx_digest(_vote(ballot_id)) for ballot_id in "ABC"]
+        self.assertNotEqual(voting.merkle_root(leaves), voting.merkle_root(leaves + leaves[-1:]))
+
+
+class BlockHeaderTest(unittest.TestCase):
+    def test_nonce_and_padding_fit_in_the_last_sha256_block(self):
+        block = voting.Block(1, [_vote("A")], 1.0, "ab" * 32)
+        # 8 nonce bytes plus at least 9 bytes of SHA-256 padding must fit in one 64-byte block
+        self.assertLessEqual(len(block._preimage) % 64, 64 - 8 - 9)
+
+
+class MiningTest(unittest.TestCase):
+    def _assert_mined(self, block, difficulty):
+        self.assertTrue(block.hash.startswith("0" * difficulty))
+        self.assertTrue(block.is_valid())
+
+    def test_serial_mining_meets_difficulty(self):
+        for difficulty in range(1, 5):
+            block = voting.Block(1, [_vote("A")], 1.0, "ab" * 32)
+            block.proof_of_work(difficulty, workers=1)
+            self._assert_mined(block, difficulty)
+
+    def test_parallel_mining_falls_back_when_workers_cannot_import_the_miner(self):
+        voting._workers_can_load_miner.cache_clear()
+        self.assertFalse(voting._workers_can_load_miner())
+        block = voting.Block(1, [_vote("A")], 1.0, "ab" * 32)
+        block.proof_of_work(4, workers=2)
+        self._assert_mined(block, 4)
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork", "workers inherit the module only when forked")
+    def test_parallel_mining_meets_difficulty(self):
+        voting._workers_can_load_miner.cache_clear()
+        self.addCleanup(voting._workers_can_load_miner.cache_clear)
+        with mock.patch.dict(sys.modules, {voting.__name__: voting}):
+            self.assertTrue(voting._workers_can_load_miner())
+            block = voting.Block(1, [_vote("A")], 1.0, "ab" * 32)
+            block.proof_of_work(4, workers=2)
+        self._assert_mined(block, 4)
+
+    def test_worker_chunks_find_a_valid_nonce(self):
+        voting._init_miner(multiprocessing.Event(), multiprocessing.Value("Q", 0))
+        prefix = voting.Block(1, [_vote("A")], 1.0, "ab" * 32)._preimage
+        nonce, digest = voting._mine_chunks(prefix, 3)
+        self.assertEqual(digest, hashlib.sha256(prefix + voting._NONCE.pack(nonce)).digest())
+        self.assertTrue(digest.hex().startswith("000"))
+
+    def test_jit_scanner_matches_serial_search(self):
+        scanner = voting._load_jit_scanner()
+        if scanner is None:
+            self.skipTest("numba, cffi or libcrypto is not available")
+        prefix = voting.Block(1, [_vote("A")], 1.0, "ab" * 32)._preimage
+        with mock.patch.object(voting, "JIT_MIN_DIFFICULTY", 100):
+            expected = voting._mine(prefix, 3)
+        self.assertEqual(voting._mine_jit(scanner, prefix, 3, 0, None), expected)
+
+
+class BlockValidationTest(unittest.TestCase):
+    def test_repeated_last_vote_is_rejected(self):
+        blockchain = _chain_with_block([_vote("A"), _vote("B"), _vote("C")])
+        self.assertTrue(blockchain.is_chain_valid())
+
+        block = blockchain.last_block
+        block.transactions.append(block.transactions[-1])
+        self.assertFalse(blockchain.is_chain_valid())
+
+    def test_repeated_ballot_id_is_rejected(self):
+        blockchain = _chain_with_block([_vote("A", "first"), _vote("A", "second")])
+        self.assertFalse(blockchain.is_chain_valid())
+
+    def test_ballot_id_repeated_across_blocks_is_rejected(self):
+        blockchain = _chain_with_block([_vote("A", "first")])
+        blockchain.add_transaction(_vote("A", "second"))
+        blockchain.sign_pending_transactions()
+        self.assertFalse(blockchain.is_chain_valid())
+
+    def test_genesis_block_seal_is_checked(self):
+        election = voting.Election("Test", ["Candidate A"], ["District 1"])
+        self.assertTrue(election.blockchain.is_chain_valid())
+
+        election.blockchain.chain[0].signature = None
+        self.assertFalse(election.blockchain.is_chain_valid())
+
+    def test_edited_genesis_block_is_rejected(self):
+        election = voting.Election("Test", ["Candidate A"], ["District 1"])
+        election.blockchain.chain[0].timestamp += 1
+        self.assertFalse(election.blockchain.is_chain_valid())
+
+
+class SignatureTest(unittest.TestCase):
+    def setUp(self):
+        self.private_key, public_key = voting.Voter.generate_keys()
+        self.public_key_pem = public_key.public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode()
+
+    def _signed_registration(self, voter_id="v1"):
+        transaction = voting.RegistrationTx(
+            voter_id=voter_id, district="District 1", public_key=self.public_key_pem, timestamp=1.0
+        )
+        return voting.sign_transaction(self.private_key, transaction)
+
+    def test_signed_transaction_verifies(self):
+        self.assertTrue(voting.Blockchain(0).verify_transaction(self._signed_registration()))
+
+    def test_tampered_field_is_rejected(self):
+        transaction = self._signed_registration()
+        transaction.district = "District 2"
+        self.assertFalse(voting.Blockchain(0).verify_transaction(transaction))
+
+    def test_bad_public_key_is_rejected(self):
+        transaction = self._signed_registration()
+        transaction.public_key = "pub_key_v1"
+        self.assertFalse(voting.Blockchain(0).verify_transaction(transaction))
+
+    def test_bad_signature_hex_is_rejected(self):
+        transaction = self._signed_registration()
+        transaction.signature = "not hex"
+        self.assertFalse(voting.Blockchain(0).verify_transaction(transaction))
+
+    def test_invalid_transaction_is_dropped_at_flush(self):
+        blockchain = voting.Blockchain(0)
+        blockchain.create_genesis_block()
+        self.assertTrue(blockchain.add_transaction(self._signed_registration("v1")))
+        self.assertTrue(blockchain.add_transaction(self._signed_registration("v2")))
+        # Tampered after the check in add_transaction; the batch check at flush must catch it
+        blockchain.pending_transactions[0].district = "District 2"
+
+        self.assertTrue(blockchain.sign_pending_transactions())
+        self.assertEqual([transaction.voter_id for transaction in blockchain.last_block.transactions], ["v2"])
+
+
+class TallyTest(unittest.TestCase):
+    def test_vote_from_unknown_district_is_skipped(self):
+        election = voting.Election("Test", ["Candidate A"], ["District 1"])
+        encrypted_vote = election._fernet.encrypt(b"Candidate A").decode()
+        election.blockchain.add_transaction(
+            voting.VoteTx(ballot_id="A", district="District 9", encrypted_vote=encrypted_vote, timestamp=1.0)
+        )
+        election.flush()
+
+        vote_count, district_results = election.tally_votes()
+        self.assertEqual(vote_count, {"Candidate A": 0})
+        self.assertEqual(district_results, {"District 1": {"Candidate A": 0}})
+
+
+class StateFileTest(unittest.TestCase):
+    def test_legacy_inline_snapshot_is_refused(self):
+        legacy_state = {
+            "name": "General Election 2025",
+            "candidates": ["Candidate A"],
+            "districts": ["District 1"],
+            "voter_registry": {},
+            "ballot_registry": {},
+            "blockchain": [],
+            "election_key": "",
+            "difficulty": 2,
+            "genesis_created": True,
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "election_state.json")
+            with open(filename, "w") as f:
+                json.dump(legacy_state, f)
+
+            with self.assertRaises(ValueError):
+                voting.Election.load_state(filename)
+            with open(filename) as f:
+                self.assertEqual(json.load(f), legacy_state)
+
+    def test_snapshot_without_authority_key_is_refused(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "election_state.json")
+            voting.Election("Test", ["Candidate A"], ["District 1"]).save_state(filename)
+            with open(filename) as f:
+                state = json.load(f)
+            del state["authority_public_key"]
+            with open(filename, "w") as f:
+                json.dump(state, f)
+
+            with self.assertRaises(ValueError):
+                voting.Election.load_state(filename)
+
+    def test_authority_private_key_is_kept_out_of_the_snapshot(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "election_state.json")
+            election = voting.Election("Test", ["Candidate A"], ["District 1"])
+            election.register_voter("v1", "District 1", "pub_key_v1")
+            election.flush()
+            election.save_state(filename)
+
+            with open(filename) as f:
+                self.assertNotIn("authority_key", json.load(f))
+            key_path = voting._authority_key_path(filename)
+            self.assertEqual(os.stat(key_path).st_mode & 0o777, 0o600)
+
+            election = voting.Election.load_state(filename)
+            self.assertTrue(election.blockchain.is_chain_valid())
+            election.register_voter("v2", "District 1", "pub_key_v2")
+            self.assertTrue(election.flush())
+
+    def test_election_without_authority_private_key_is_verified_but_not_extended(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "election_state.json")
+            election = voting.Election("Test", ["Candidate A"], ["District 1"])
+            election.register_voter("v1", "District 1", "pub_key_v1")
+            election.flush()
+            election.save_state(filename)
+            os.remove(voting._authority_key_path(filename))
+
+            election = voting.Election.load_state(filename)
+            self.assertTrue(election.blockchain.is_chain_valid())
+            election.register_voter("v2", "District 1", "pub_key_v2")
+            with self.assertRaises(ValueError):
+                election.flush()
+            self.assertEqual(len(election.blockchain.pending_transactions), 1)
+
+    def test_interrupted_save_does_not_mine_transactions_twice(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "election_state.json")
+            election = voting.Election("Test", ["Candidate A"], ["District 1"])
+            election.register_voter("v1", "District 1", "pub_key_v1")
+            election.cast_vote("v1", "ballot", "Candidate A", None)
+            election.save_state(filename)
+
+            # Flush, then stop the save after the chain log, before the snapshot is rewritten
+            election.flush()
+            chain_path, _ = voting._log_paths(filename)
+            election.append_blocks(chain_path, election.blockchain.chain[election._saved_blocks:])
+
+            election = voting.Election.load_state(filename)
+            self.assertEqual(election.blockchain.pending_transactions, [])
+            self.assertFalse(election.flush())
+            self.assertEqual(election.tally_votes()[0], {"Candidate A": 1})
+
+    def test_restored_block_keeps_stored_tx_root(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "election_state.json")
+            election = voting.Election("Test", ["Candidate A"], ["District 1"])
+            election.register_voter("v1", "District 1", "pub_key_v1")
+            election.flush()
+            election.save_state(filename)
+
+            election = voting.Election.load_state(filename)
+            self.assertTrue(election.blockchain.is_chain_valid())
+
+            election.blockchain.last_block.transactions[0].district = "District 2"
+            self.assertFalse(election.blockchain.is_chain_valid())
+
+    def test_torn_log_tail_is_cut_before_appending(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "election_state.json")
+            election = voting.Election("Test", ["Candidate A"], ["District 1"])
+            election.register_voter("v1", "District 1", "pub_key_v1")
+            election.flush()
+            election.save_state(filename)
+
+            # Interrupt the next save partway through appending its block
+            chain_path, _ = voting._log_paths(filename)
+            saved_size = os.path.getsize(chain_path)
+            election.register_voter("v2", "District 1", "pub_key_v2")
+            election.flush()
+            election.append_blocks(chain_path, election.blockchain.chain[election._saved_blocks:])
+            with open(chain_path, "r+b") as f:
+                f.truncate(saved_size + 20)
+
+            election = voting.Election.load_state(filename)
+            self.assertEqual(len(election.blockchain.chain), 2)
+            self.assertEqual(os.path.getsize(chain_path), saved_size + 20)  # loading leaves the log as it is
+
+            election.register_voter("v3", "District 1", "pub_key_v3")
+            election.flush()
+            election.save_state(filename)
+
+            election = voting.Election.load_state(filename)
+            self.assertEqual(len(election.blockchain.chain), 3)
+            self.assertTrue(election.blockchain.is_chain_valid())
+            self.assertEqual(set(election.voter_registry), {"v1", "v3"})
+
+    def test_chain_log_missing_saved_blocks_is_refused(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "election_state.json")
+            election = voting.Election("Test", ["Candidate A"], ["District 1"])
+            election.register_voter("v1", "District 1", "pub_key_v1")
+            election.flush()
+            election.save_state(filename)
+
+            chain_path, _ = voting._log_paths(filename)
+            with open(chain_path, "r+b") as f:
+                f.truncate(os.path.getsize(chain_path) - 20)
+
+            with self.assertRaises(ValueError):
+                voting.Election.load_state(filename)
+
+if __name__ == "__main__":
+    unittest.main()